@@ -0,0 +1,81 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+
+"""
+Benchmark the FormatWalker on a large vars tree.
+
+Usage: poetry run python benchmarks/format_walker.py [--size 10000] [--repeat 5]
+"""
+
+import argparse
+import copy
+import time
+from typing import Any
+
+from c2c.template import FormatWalker
+
+
+def generate(size: int) -> tuple[dict[str, Any], list[str]]:
+    """Generate a vars tree with about `size` variables, and the matching no_interpreted list."""
+    used_vars: dict[str, Any] = {}
+    no_interpreted = []
+    for index in range(size // 10):
+        used_vars[f"var{index}"] = f"value {index}"
+        used_vars[f"ref{index}"] = f"{{var{index}}} {{ref{index - 1}}}" if index > 0 else "{var0}"
+        used_vars[f"obj{index}"] = {
+            "string": f"{{var{index}}}",
+            "int": index,
+            "list": [f"{{ref{index}}}", "{{escaped}}", {"name": "{var0}"}],
+            "raw": "{not_interpreted}",
+        }
+        no_interpreted.append(f"obj{index}.raw")
+        if index % 2 == 0:
+            no_interpreted.append(f"obj{index}.list[1]")
+        else:
+            no_interpreted.append(f"obj{index}.list[]")
+    return used_vars, no_interpreted
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=10000, help="the number of variables")
+    parser.add_argument("--repeat", type=int, default=5, help="the number of runs")
+    options = parser.parse_args()
+
+    used_vars, no_interpreted = generate(options.size)
+    timings = []
+    for _ in range(options.repeat):
+        current_vars = copy.deepcopy(used_vars)
+        start = time.perf_counter()
+        FormatWalker(current_vars, no_interpreted, [])()
+        timings.append(time.perf_counter() - start)
+    print(f"FormatWalker on {options.size} variables: best {min(timings):.3f}s, worst {max(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+"""
+Benchmark the startup of the command line, from a cache file, with ``-X importtime``.
+
+Usage: poetry run python benchmarks/startup.py [--repeat 10] [--max-ms 60]
+"""
+
+import argparse
+import json
+import os
+import subprocess  # nosec
+import sys
+import tempfile
+
+# The modules that should not be imported to get some vars from a cache file
+FORBIDDEN_MODULES = (
+    "yaml",
+    "yaml_include",
+    "bottle",
+    "jinja2",
+    "mako",
+    "sqlite3",
+    "subprocess",
+    "multiprocessing",
+)
+
+_SCRIPT = "import sys; sys.argv = sys.argv[1:]; import c2c.template; c2c.template.main()"
+
+
+def import_times(cache_file: str) -> dict[str, int]:
+    """Get the cumulative import time in microseconds of the top level modules, of a `--get-vars` run."""
+    result = subprocess.run(  # nosec # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", _SCRIPT, "", "--cache", cache_file, "--get-vars", "var"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        encoding="utf-8",
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[13:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=10, help="the number of runs")
+    parser.add_argument("--max-ms", type=float, help="fail if the import time is greater")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache_file = os.path.join(directory, "cache.json")
+        with open(cache_file, "w", encoding="utf-8") as file_open:
+            file_open.write(json.dumps({"used_vars": {"var": "value"}, "config": {}}))
+        runs = [import_times(cache_file) for _ in range(options.repeat)]
+
+    forbidden = sorted({name for times in runs for name in times if name in FORBIDDEN_MODULES})
+    if forbidden:
+        print(f"Unexpected imported modules: {', '.join(forbidden)}")
+        sys.exit(1)
+
+    total = min(sum(value for name, value in times.items() if "." not in name) for times in runs) / 1000
+    package = min(times.get("c2c.template", 0) for times in runs) / 1000
+    print(f"Total import time: {total:.1f} ms, c2c.template: {package:.1f} ms")
+    if options.max_ms is not None and total > options.max_ms:
+        print(f"The import time is greater than {options.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
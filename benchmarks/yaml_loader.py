@@ -0,0 +1,94 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+
+"""
+Benchmark the YAML loading and dumping, with the pure Python and the libyaml implementations.
+
+Usage: poetry run python benchmarks/yaml_loader.py [--size 20000] [--repeat 3]
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+from typing import Any
+
+import yaml
+
+from c2c.template.yaml_loader import YamlSafeDumper, YamlSafeLoader
+
+
+def generate(size: int) -> dict[str, Any]:
+    """Generate a vars file content with about `size` variables."""
+    return {
+        "vars": {
+            f"var{index}": {
+                "string": f"value {index}",
+                "int": index,
+                "float": index / 3,
+                "list": [f"{{var{index}}}", index, {"name": f"item {index}"}],
+            }
+            for index in range(size // 4)
+        },
+        "interpreted": {"python": [f"var{index}.string" for index in range(0, size // 4, 10)]},
+    }
+
+
+def measure(function: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=20000, help="the number of variables")
+    parser.add_argument("--repeat", type=int, default=3, help="the number of runs")
+    options = parser.parse_args()
+
+    data = generate(options.size)
+    content = yaml.dump(data, Dumper=yaml.SafeDumper)
+    print(f"Document of {len(content) / 1024 / 1024:.1f} MiB")
+
+    implementations = [("Python", yaml.SafeLoader, yaml.SafeDumper)]
+    if yaml.__with_libyaml__:
+        implementations.append(("libyaml", yaml.CSafeLoader, yaml.CSafeDumper))
+    else:
+        print("libyaml isn't available")
+    print(f"c2c.template uses {YamlSafeLoader.__name__} and {YamlSafeDumper.__name__}")
+
+    for name, loader, dumper in implementations:
+        load_time = measure(lambda loader=loader: yaml.load(content, loader), options.repeat)  # nosec # noqa: S506
+        dump_time = measure(lambda dumper=dumper: yaml.dump(data, Dumper=dumper), options.repeat)
+        print(f"{name}: load {load_time:.3f}s, dump {dump_time:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,23 +28,29 @@
 """The template module."""
 
 import copy
+import functools
 import itertools
 import json
 import logging
 import os
 import re
-import subprocess  # nosec
 import sys
 import traceback
 from argparse import ArgumentParser, Namespace
-from collections.abc import Callable
+from collections import ChainMap, deque
+from collections.abc import Callable, Iterable, Mapping
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from string import Formatter
-from subprocess import CalledProcessError  # nosec
-from typing import Any, Protocol, cast
+from types import CodeType, MappingProxyType
+from typing import IO, TYPE_CHECKING, Any, Protocol, cast
 
-import yaml
-import yaml_include
-from yaml.parser import ParserError
+from c2c.template import indexed_cache
+
+if TYPE_CHECKING:
+    from c2c.template import engines
+    from c2c.template.interpreter_cache import InterpreterCache
+    from c2c.template.manifest import Manifest
 
 Value = str | int | float | dict[str, Any] | list[Any]
 
@@ -54,6 +60,23 @@ ESCAPE_DOT_RE = re.compile(r"\\.")
 INDEX_RE = re.compile(r"^\[([0-9]+)\]$")
 
 
+POSTPROCESS_VALUE_NAME = "__value__"
+
+# The operations of a batch file, named as the command line options
+BATCH_OPERATIONS = ("get-vars", "get-config", "get-cache", "files", "files-builder")
+
+# The fsync policies of the generated files
+FSYNC_NONE = "none"
+FSYNC_FILE = "file"
+FSYNC_BATCH = "batch"
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_expression(expression: str) -> CodeType:
+    """Compile a Python expression, once per expression."""
+    return compile(expression, "<expression>", "eval")
+
+
 def dot_split(string: str) -> list[str]:
     result = DOT_SPLITTER_RE.split(string)
     return [ESCAPE_DOT_RE.sub(".", i) for i in result if i != ""]
@@ -114,16 +137,18 @@ def transform_path(
         LOG.warning("The value '%s' in '%s' is not valid, it should be a list or a dict", value, current_path)
 
 
-def get_config(file_name: str) -> dict[str, Any]:
+def get_config(file_name: str, jobs: int = 1) -> dict[str, Any]:
+    from c2c.template import yaml_loader  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
     with open(file_name, encoding="utf-8") as config_file:
-        config = yaml.safe_load(config_file.read())
+        config = yaml_loader.load(config_file.read())
     format_walker = FormatWalker(
         config["vars"],
         config.get("no_interpreted", []),
         config.get("environment", []),
     )
     format_walker()
-    return do_process(config, format_walker.used_vars)
+    return do_process(config, format_walker.used_vars, jobs)
 
 
 def main() -> None:
@@ -139,6 +164,13 @@ def main() -> None:
     parser.add_argument("--vars", "-c", help="the YAML file defining the variables")
     parser.add_argument("--cache", help="the generated cache file")
     parser.add_argument("--get-cache", help="generate a cache file")
+    parser.add_argument(
+        "--cache-format",
+        choices=["json", "indexed"],
+        default="json",
+        help="the format of the generated cache file, "
+        "the indexed format gives a fast access to some vars of a big cache",
+    )
     parser.add_argument("--section", action="store_true", help="use the section (template specific)")
     parser.add_argument("--files", nargs="*", help="the files to interpret")
     parser.add_argument(
@@ -153,6 +185,51 @@ def main() -> None:
         "and get the value on iter on the variable referenced by the third argument"
     )
     parser.add_argument("--files-builder", nargs=3, metavar="ARG", help=files_builder_help)
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="run the operations of a JSON or YAML batch file ('-' for stdin) against the vars read once, "
+        "the results are printed as JSON",
+    )
+    parser.add_argument(
+        "--serve",
+        metavar="SOCKET",
+        help="serve the batch operations on a Unix socket, as JSON lines, "
+        "the vars are read again when one of the vars files changes",
+    )
+    parser.add_argument(
+        "--jobs",
+        "-j",
+        type=int,
+        default=1,
+        help="the number of bash and cmd interpreters of the same priority, "
+        "and of files to render, to run in parallel",
+    )
+    parser.add_argument(
+        "--manifest",
+        help="the manifest file used to skip the files whose template and used vars have not changed",
+    )
+    parser.add_argument(
+        "--template-cache",
+        metavar="DIR",
+        help="the directory where the compiled templates are cached between the runs",
+    )
+    parser.add_argument(
+        "--fsync",
+        choices=[FSYNC_NONE, FSYNC_FILE, FSYNC_BATCH],
+        default=FSYNC_NONE,
+        help="flush the generated files to the disk: never, after each file, or all at the end of the run",
+    )
+    parser.add_argument(
+        "--no-interpreter-cache",
+        action="store_true",
+        help="don't use the cache of the bash and cmd interpreters results",
+    )
+    parser.add_argument(
+        "--purge-interpreter-cache",
+        action="store_true",
+        help="remove all the cached bash and cmd interpreters results before running",
+    )
     options = parser.parse_args()
     do(options)
 
@@ -169,9 +246,10 @@ class FormatWalker:
         runtime_environment_pattern: str | None = None,
     ) -> None:
         """Initialize the walker."""
-        self.formatted: list[str] = []
+        self.formatted: set[str] = set()
         self.used_vars = used_vars
         self.no_interpreted = no_interpreted
+        self._no_interpreted_paths = frozenset(no_interpreted)
         self.environment = environment
         self.runtime_environment = runtime_environment or []
 
@@ -191,71 +269,93 @@ class FormatWalker:
             else:
                 self.all_environment_dict[env["name"]] = os.environ[env["name"]]
 
-    def path_in(self, path_list: list[str], list_: list[str]) -> bool:
-        return any(path in list_ for path in path_list)
-
     def format_walker(
         self,
-        current_vars: dict[str, Any],
+        current_vars: dict[str, Any] | list[Any],
         path: str | None = None,
-        path_list: list[str] | None = None,
-    ) -> tuple[dict[str, Any], list[tuple[str, str]]]:
-        if isinstance(current_vars, str):
-            if path not in self.formatted:
-                if self.path_in(path_list, self.no_interpreted):
-                    self.formatted.append(path)
-                    return current_vars, []
-                attrs = self.formatter.parse(current_vars)
-                for _, attr, _, _ in attrs:
-                    if (
-                        attr is not None
-                        and attr not in self.formatted
-                        and attr not in self.all_environment_dict
-                    ):
-                        return current_vars, [(path, attr)]
-                self.formatted.append(path)
-                vars_ = {}
-                vars_.update(self.all_environment_dict)
-                vars_.update(self.used_vars)
-                return current_vars.format(**vars_), []
-            return current_vars, []
-
+        wildcard_path: str | None = None,
+    ) -> list["_FormatNode"]:
+        """
+        Walk the vars and collect the strings that should be formatted.
+
+        The strings that don't need to be formatted and the other leaf values are directly
+        marked as formatted.
+
+        The `wildcard_path` is the path where the index of the innermost list is replaced by `[]`,
+        used to match the `no_interpreted` paths like `list[].key`.
+        """
+        nodes: list[_FormatNode] = []
         if isinstance(current_vars, list):
-            formatteds = []
+            new_wildcard_path = f"{path}[]"
             for index, var in enumerate(current_vars):
-                new_path = f"{path}[{index}]"
-                new_path_list = []
-                assert path_list is not None  # nosec
-                for _ in path_list:
-                    new_path_list += [f"{path}[{index}]", f"{path}[]"]
-                formatteds.append(self.format_walker(var, new_path, new_path_list))
-            return [v for v, _ in formatteds], list(itertools.chain(*(s for _, s in formatteds)))
-
-        if isinstance(current_vars, dict):
-            skip = []
-            for key in current_vars:  # noqa: PLC0206
-                if path is None:
-                    current_path = key
-                    current_path_list = [key]
-                else:
-                    current_path = f"{path}.{key}"
-                    assert path_list is not None  # nosec
-                    current_path_list = [f"{pl}.{key}" for pl in path_list]
-                current_formatted = self.format_walker(current_vars[key], current_path, current_path_list)
-                current_vars[key] = current_formatted[0]
-                skip += current_formatted[1]
-            return current_vars, skip
-        self.formatted.append(path)
+                self._walk_value(current_vars, index, var, f"{path}[{index}]", new_wildcard_path, nodes)
+            return nodes
 
-        return current_vars, []
+        for key, value in current_vars.items():
+            current_path = key if path is None else f"{path}.{key}"
+            current_wildcard_path = None if wildcard_path is None else f"{wildcard_path}.{key}"
+            self._walk_value(current_vars, key, value, current_path, current_wildcard_path, nodes)
+        return nodes
 
-    def __call__(self) -> None:
-        skip: list[tuple[str, str]] | None = None
-        old_skip = sys.maxsize
-        while skip is None or (old_skip != len(skip) and len(skip) != 0):
-            old_skip = sys.maxsize if skip is None else len(skip)
-            self.used_vars, skip = self.format_walker(self.used_vars)
+    def _walk_value(
+        self,
+        container: dict[str, Any] | list[Any],
+        key: str | int,
+        value: Any,
+        path: str,
+        wildcard_path: str | None,
+        nodes: list["_FormatNode"],
+    ) -> None:
+        if isinstance(value, (dict, list)):
+            nodes += self.format_walker(value, path, wildcard_path)
+        elif isinstance(value, str) and not (
+            path in self._no_interpreted_paths or wildcard_path in self._no_interpreted_paths
+        ):
+            dependencies = []
+            for _, attr, _, _ in self.formatter.parse(value):
+                if attr is not None and attr not in self.all_environment_dict and attr not in dependencies:
+                    dependencies.append(attr)
+            nodes.append(_FormatNode(container, key, path, dependencies))
+        else:
+            self.formatted.add(path)
 
+    def __call__(self) -> None:
+        nodes = self.format_walker(self.used_vars)
+
+        # Build the dependency graph between the paths, and format the strings in topological order
+        waiting: dict[str, list[_FormatNode]] = {}
+        ready: deque[_FormatNode] = deque()
+        for node in nodes:
+            node.missing = {
+                dependency for dependency in node.dependencies if dependency not in self.formatted
+            }
+            if node.missing:
+                for dependency in node.missing:
+                    waiting.setdefault(dependency, []).append(node)
+            else:
+                ready.append(node)
+
+        # Read-only view on the vars over the environment, that reflects the formatted values
+        namespace = MappingProxyType(ChainMap(self.used_vars, self.all_environment_dict))
+        while ready:
+            node = ready.popleft()
+            if node.path in self.formatted:
+                continue
+            node.container[node.key] = node.container[node.key].format_map(namespace)  # type: ignore[index]
+            self.formatted.add(node.path)
+            for dependent in waiting.pop(node.path, []):
+                dependent.missing.discard(node.path)
+                if not dependent.missing:
+                    ready.append(dependent)
+
+        skip = [
+            (
+                node.path,
+                next(dependency for dependency in node.dependencies if dependency not in self.formatted),
+            )
+            for node in nodes
+            if node.missing
+        ]
         if len(skip) > 0:
             LOG.error(
                 "The following variable isn't correctly interpreted due missing dependency:\n%s",
@@ -264,6 +364,21 @@ class FormatWalker:
             sys.exit(1)
 
 
+class _FormatNode:
+    """A string to be formatted, with the paths it depends on."""
+
+    __slots__ = ("container", "dependencies", "key", "missing", "path")
+
+    def __init__(
+        self, container: dict[str, Any] | list[Any], key: str | int, path: str, dependencies: list[str]
+    ) -> None:
+        self.container = container
+        self.key = key
+        self.path = path
+        self.dependencies = dependencies
+        self.missing: set[str] = set()
+
+
 def do(options: Namespace) -> None:  # pylint: disable=invalid-name
     if options.cache is not None and options.vars is not None:
         LOG.error("The --vars and --cache options cannot be used together")
@@ -272,85 +387,254 @@ def do(options: Namespace) -> None:  # pylint: disable=invalid-name
         LOG.error("One of the --vars or --cache options is required")
         sys.exit(1)
 
+    if options.serve is not None:
+        from c2c.template import serve  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+        serve.serve(options)
+        return
+
+    used_vars, config, _ = _read_options_vars(options)
+
+    if options.batch is not None:
+        print(
+            json.dumps(_run_operations(options, used_vars, config, _read_batch(options.batch)), default=repr)
+        )
+        return
+
+    used_vars = _format_vars(
+        options,
+        used_vars,
+        config,
+        render=options.files_builder is not None or options.files is not None,
+        keep_runtime=options.get_config is not None or options.get_cache is not None,
+    )
+
+    if options.get_cache is not None:
+        _write_cache(options.get_cache, options.cache_format, used_vars, config)
+
+    for name, value in _get_vars(options.get_vars, used_vars):
+        print(f"{name}={value!r}")
+
+    if options.get_config is not None:
+        _write_config(options.get_config, used_vars, config)
+
+    _render_files(options, used_vars)
+
+
+def _read_batch(file_name: str) -> list[Any]:
+    if file_name == "-":
+        content = sys.stdin.read()
+    else:
+        with open(file_name, encoding="utf-8") as file_open:
+            content = file_open.read()
+    if file_name.endswith(".json"):
+        jobs = json.loads(content)
+    else:
+        from c2c.template import yaml_loader  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+        jobs = yaml_loader.load(content)
+    if not isinstance(jobs, list):
+        LOG.error("The batch file '%s' should contain a list of operations", file_name)
+        sys.exit(1)
+    return jobs
+
+
+def _run_operations(
+    options: Namespace,
+    used_vars: Mapping[str, Any],
+    config: dict[str, Any],
+    jobs: list[Any],
+    formatted: dict[tuple[bool, bool], Mapping[str, Any]] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Run the operations of a batch against the vars read once.
+
+    Each operation is a mapping with one key, the name of the command line option, and the
+    arguments of the option as value, e.g. ``{"get-vars": ["MY_VAR=my_var"]}``.
+    The vars are formatted once for each kind of operation, as for the equivalent command line,
+    and kept in `formatted` for the next operations.
+
+    Returns
+    -------
+    The results, in the order of the operations: the vars for ``get-vars``, the written files
+    for the other operations.
+    """
+    if formatted is None:
+        formatted = {}
+    results: list[dict[str, Any]] = []
+    for job in jobs:
+        if not isinstance(job, dict) or len(job) != 1 or next(iter(job)) not in BATCH_OPERATIONS:
+            LOG.error(
+                "The batch operation '%s' should be a mapping with one of the keys: %s",
+                job,
+                ", ".join(BATCH_OPERATIONS),
+            )
+            sys.exit(1)
+        ((operation, arguments),) = job.items()
+
+        render = operation in ("files", "files-builder")
+        keep_runtime = operation in ("get-config", "get-cache")
+        if (render, keep_runtime) not in formatted:
+            # The vars are formatted in place
+            formatted[(render, keep_runtime)] = _format_vars(
+                options,
+                used_vars if options.cache is not None and not render else copy.deepcopy(dict(used_vars)),
+                config,
+                render,
+                keep_runtime,
+            )
+        operation_vars = formatted[(render, keep_runtime)]
+
+        result: Any
+        if operation == "get-vars":
+            result = dict(_get_vars(arguments, operation_vars))
+        elif operation == "get-config":
+            _write_config(arguments, operation_vars, config)
+            result = arguments[0]
+        elif operation == "get-cache":
+            _write_cache(arguments, options.cache_format, operation_vars, config)
+            result = arguments
+        else:
+            result = _render_files(
+                Namespace(
+                    **{
+                        **vars(options),
+                        "files": arguments if operation == "files" else None,
+                        "files_builder": arguments if operation == "files-builder" else None,
+                    }
+                ),
+                operation_vars,
+            )
+        results.append({operation: result})
+    return results
+
+
+def _read_options_vars(options: Namespace) -> tuple[Mapping[str, Any], dict[str, Any], list[str]]:
+    """Read the vars from the cache, or from the vars file with the interpreters, with the read files."""
     if options.cache is not None:
+        files = [os.path.abspath(options.cache)]
+        if indexed_cache.is_indexed(options.cache):
+            # The vars are decoded on access
+            cache_file = indexed_cache.IndexedCache(options.cache)
+            return cache_file.used_vars, cache_file.config, files
         with open(options.cache, encoding="utf-8") as file_open:
             cache = json.loads(file_open.read())
-            used_vars = cache["used_vars"]
-            config = cache["config"]
-
-        if options.files_builder is not None or options.files is not None:
-            format_walker = FormatWalker(
-                used_vars,
-                config.get("no_interpreted", []),
-                [],
-                config.get("runtime_environment", []),
-                options.runtime_environment_pattern,
-            )
-            format_walker()
-            used_vars = format_walker.used_vars
-    else:
-        used_vars, config = read_vars(options.vars)
+            return cache["used_vars"], cache["config"], files
+
+    from c2c.template.interpreter_cache import (  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+        InterpreterCache,
+    )
+
+    interpreter_cache = InterpreterCache()
+    if options.purge_interpreter_cache:
+        interpreter_cache.purge()
+    return _read_vars(
+        options.vars, options.jobs, None if options.no_interpreter_cache else interpreter_cache, memoize=False
+    )
 
+
+def _format_vars(
+    options: Namespace,
+    used_vars: Mapping[str, Any],
+    config: dict[str, Any],
+    render: bool,
+    keep_runtime: bool,
+) -> Mapping[str, Any]:
+    """
+    Format the vars, in place for the vars read from a vars file.
+
+    The vars from a cache are only formatted to render some files, the runtime environment of the
+    vars read from a vars file is kept as placeholders to generate a configuration or a cache.
+    """
+    if options.cache is not None:
+        if not render:
+            return used_vars
+        format_walker = FormatWalker(
+            dict(used_vars),
+            config.get("no_interpreted", []),
+            [],
+            config.get("runtime_environment", []),
+            options.runtime_environment_pattern,
+        )
+    else:
         format_walker = FormatWalker(
-            used_vars,
+            cast("dict[str, Any]", used_vars),
             config.get("no_interpreted", []),
             config.get("environment", []),
             config.get("runtime_environment", []),
-            (
-                "{{{}}}"
-                if options.get_config is not None or options.get_cache is not None
-                else options.runtime_environment_pattern
-            ),
+            "{{{}}}" if keep_runtime else options.runtime_environment_pattern,
         )
-        format_walker()
-        used_vars = format_walker.used_vars
+    format_walker()
+    return format_walker.used_vars
 
-    if options.get_cache is not None:
-        cache = {
-            "used_vars": used_vars,
-            "config": config,
-        }
-        del cache["config"]["vars"]
-        del cache["config"]["environment"]
-        with open(options.get_cache, "wb") as file_open:
-            file_open.write(json.dumps(cache).encode("utf-8"))
-
-    for get_var in options.get_vars:
+
+def _write_cache(
+    file_name: str, cache_format: str, used_vars: Mapping[str, Any], config: dict[str, Any]
+) -> None:
+    cache_config = {key: value for key, value in config.items() if key not in ("vars", "environment")}
+    if cache_format == "indexed":
+        indexed_cache.write(file_name, used_vars, cache_config)
+    else:
+        with open(file_name, "wb") as file_open:
+            file_open.write(json.dumps({"used_vars": used_vars, "config": cache_config}).encode("utf-8"))
+
+
+def _get_vars(get_vars: list[str], used_vars: Mapping[str, Any]) -> list[tuple[str, Any]]:
+    """Get the vars, as (name, value), from the `MY_VAR=my_var` or `my_var` arguments."""
+    result = []
+    for get_var in get_vars:
         corresp = get_var.split("=")
         if len(corresp) == 1:
-            corresp = (get_var.upper(), get_var)
+            corresp = [get_var.upper(), get_var]
 
         if len(corresp) != 2:  # pragma: nocover
             LOG.error("The get variable '%s' has more than one '='", get_var)
             sys.exit(1)
 
-        print(f"{corresp[0]}={used_vars[corresp[1]]!r}")
+        result.append((corresp[0], used_vars[corresp[1]]))
+    return result
 
-    if options.get_config is not None:
-        new_vars: dict[str, Any] = {"vars": {}}
-        for variable in options.get_config[1:]:
-            var_path = variable.split(".")
-            value = used_vars
-            for key in var_path:
-                if key in value:
-                    value = value[key]
-                else:
-                    LOG.warning("The variable '%s' don't exists", variable)
 
-            new_vars["vars"][variable] = value
-        new_vars["environment"] = [
-            {"name": env} if isinstance(env, str) else env for env in config.get("runtime_environment", [])
-        ]
-        new_vars["interpreted"] = config.get("runtime_interpreted", [])
-        new_vars["postprocess"] = config.get("runtime_postprocess", [])
-        new_vars["no_interpreted"] = config.get("no_interpreted", [])
+def _write_config(get_config: list[str], used_vars: Mapping[str, Any], config: dict[str, Any]) -> None:
+    from c2c.template import yaml_loader  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
 
-        with open(options.get_config[0], "wb") as file_open:
-            file_open.write(yaml.safe_dump(new_vars).encode("utf-8"))
+    new_vars: dict[str, Any] = {"vars": {}}
+    for variable in get_config[1:]:
+        var_path = variable.split(".")
+        value: Any = used_vars
+        for key in var_path:
+            if key in value:
+                value = value[key]
+            else:
+                LOG.warning("The variable '%s' don't exists", variable)
+
+        new_vars["vars"][variable] = value
+    new_vars["environment"] = [
+        {"name": env} if isinstance(env, str) else env for env in config.get("runtime_environment", [])
+    ]
+    new_vars["interpreted"] = config.get("runtime_interpreted", [])
+    new_vars["postprocess"] = config.get("runtime_postprocess", [])
+    new_vars["no_interpreted"] = config.get("no_interpreted", [])
+
+    with open(get_config[0], "wb") as file_open:
+        file_open.write(yaml_loader.dump(new_vars).encode("utf-8"))
+
+
+def _render_files(options: Namespace, used_vars: Mapping[str, Any]) -> list[str]:
+    """Render the `--files` and the `--files-builder` files, return the destinations."""
+    manifest = None
+    if options.manifest is not None and (options.files_builder is not None or options.files is not None):
+        from c2c.template.manifest import (  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+            Manifest,
+        )
+
+        manifest = Manifest(options.manifest, options.engine)
 
+    parallel_files: list[tuple[str, str, Mapping[str, Any] | None]] = []
+    destinations: list[str] = []
     if options.files_builder is not None:
         var_path = options.files_builder[2].split(".")
-        values = used_vars
+        values: Any = used_vars
         for key in var_path:
             values = values[key]
 
@@ -365,16 +649,32 @@ def do(options: Namespace) -> None:  # pylint: disable=invalid-name
             sys.exit(1)
 
         for value in values:
-            file_vars = {}
-            file_vars.update(used_vars)
-            file_vars.update(value)
             template = options.files_builder[0]
             destination = options.files_builder[1].format(**value)
-            _proceed([(template, destination)], file_vars, options)
+            destinations.append(destination)
+            if options.jobs > 1:
+                parallel_files.append((template, destination, value))
+                continue
+            _proceed([(template, destination)], _layered_vars(value, used_vars), options, manifest)
 
     if options.files is not None:
         files = [(f, ".".join(f.split(".")[:-1])) for f in options.files]
-        _proceed(files, used_vars, options)
+        destinations += [destination for _, destination in files]
+        if options.jobs > 1:
+            parallel_files += [(template, destination, None) for template, destination in files]
+        else:
+            _proceed(files, used_vars, options, manifest)
+
+    if parallel_files:
+        _proceed_parallel(parallel_files, used_vars, options, manifest)
+
+    if options.fsync == FSYNC_BATCH:
+        fsync_files(destinations)
+
+    if manifest is not None:
+        manifest.save()
+
+    return destinations
 
 
 def get_path(value: dict[str, Any], path: str) -> tuple[tuple[dict[str, Any] | None, str], dict[str, Any]]:
@@ -391,44 +691,310 @@ def set_path(item: tuple[dict[str, Any], str], value: str) -> None:
     parent[element] = value
 
 
-def _proceed(files: list[tuple[str, str]], used_vars: dict[str, Any], options: Namespace) -> None:
-    if options.engine == "jinja":
-        from bottle import (  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
-            jinja2_template as engine,
-        )
+def _layered_vars(item: Mapping[str, Any], used_vars: Mapping[str, Any]) -> Mapping[str, Any]:
+    """Get the vars of an item over the shared vars, without copying them."""
+    return ChainMap(cast("dict[str, Any]", item), cast("dict[str, Any]", used_vars))
 
-        bottle_template(files, used_vars, engine)
 
-    elif options.engine == "mako":
-        from bottle import (  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
-            mako_template as engine,
-        )
+def _engine(engine_name: str, cache_dir: str | None = None) -> "Engine | None":
+    from c2c.template import engines  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    return cast("Engine | None", engines.get_render(engine_name, cache_dir))
 
-        bottle_template(files, used_vars, engine)
+
+def _proceed(
+    files: list[tuple[str, str]],
+    used_vars: Mapping[str, Any],
+    options: Namespace,
+    manifest: "Manifest | None" = None,
+) -> None:
+    engine = _engine(options.engine, options.template_cache)
+    if engine is not None:
+        bottle_template(files, used_vars, engine, manifest, fsync=options.fsync == FSYNC_FILE)
 
 
 class Engine(Protocol):
-    def __call__(self, template: str, **kwargs: Any) -> str: ...
+    def __call__(self, template: str, used_vars: Mapping[str, Any], output: "engines.Output") -> None: ...
 
 
-def bottle_template(files: list[tuple[str, str]], used_vars: dict[str, Any], engine: Engine) -> None:
+def bottle_template(
+    files: list[tuple[str, str]],
+    used_vars: Mapping[str, Any],
+    engine: Engine,
+    manifest: "Manifest | None" = None,
+    fsync: bool = False,
+) -> None:
     for template, destination in files:
-        processed = engine(template, **used_vars)
-        save(template, destination, processed)
+        if manifest is None:
+            save_stream(template, destination, engine, used_vars, fsync=fsync)
+        elif not manifest.is_up_to_date(template, destination, used_vars):
+            manifest.rendered(
+                destination,
+                *save_stream(
+                    template,
+                    destination,
+                    engine,
+                    used_vars,
+                    manifest.unchanged_output(destination),
+                    fsync=fsync,
+                ),
+            )
 
 
-def save(template: str, destination: str, processed: str) -> None:
-    with open(destination, "wb") as file_open:
-        file_open.write(processed.encode("utf-8"))
-    os.chmod(destination, os.stat(template).st_mode)
+def _fsync_directory(directory: str) -> None:
+    file_descriptor = os.open(directory or ".", os.O_RDONLY)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+
+def fsync_files(file_names: Iterable[str]) -> None:
+    """Flush the files and their directories to the disk, used by the batch fsync policy."""
+    directories = set()
+    for file_name in file_names:
+        if not os.path.exists(file_name):
+            continue
+        file_descriptor = os.open(file_name, os.O_RDONLY)
+        try:
+            os.fsync(file_descriptor)
+        finally:
+            os.close(file_descriptor)
+        directories.add(os.path.dirname(file_name))
+    for directory in directories:
+        _fsync_directory(directory)
+
+
+class _AtomicFile:
+    """
+    A file written atomically.
+
+    The content is written in a temporary file in the same directory as the destination, that gets the
+    permissions of the template, and replaces the destination when committed.
+    """
+
+    def __init__(self, destination: str) -> None:
+        self.destination = destination
+        import tempfile  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+        file_descriptor, self.temporary = tempfile.mkstemp(
+            dir=os.path.dirname(destination) or ".", prefix=f".{os.path.basename(destination)}."
+        )
+        self.file_open = os.fdopen(file_descriptor, "wb")
+
+    def commit(self, template: str, fsync: bool = False) -> None:
+        try:
+            self.file_open.flush()
+            if fsync:
+                os.fsync(self.file_open.fileno())
+            self.file_open.close()
+            os.chmod(self.temporary, os.stat(template).st_mode)
+            os.replace(self.temporary, self.destination)
+        except BaseException:
+            self.discard()
+            raise
+        if fsync:
+            _fsync_directory(os.path.dirname(self.destination))
+
+    def discard(self) -> None:
+        self.file_open.close()
+        if os.path.exists(self.temporary):
+            os.remove(self.temporary)
+
+
+def save(template: str, destination: str, processed: str, fsync: bool = False) -> None:
+    atomic_file = _AtomicFile(destination)
+    try:
+        atomic_file.file_open.write(processed.encode("utf-8"))
+    except BaseException:
+        atomic_file.discard()
+        raise
+    atomic_file.commit(template, fsync)
+
+
+class _FileOutput:
+    """Encode the rendered chunks to the file, and hash them."""
+
+    def __init__(self, file_open: IO[bytes]) -> None:
+        self.file_open = file_open
+        import hashlib  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+        self.hash = hashlib.sha256()
+
+    def write(self, chunk: str) -> None:
+        data = chunk.encode("utf-8")
+        self.hash.update(data)
+        self.file_open.write(data)
+
+
+def save_stream(
+    template: str,
+    destination: str,
+    engine: Engine,
+    used_vars: Mapping[str, Any],
+    unchanged_output: str | None = None,
+    fsync: bool = False,
+) -> tuple[str, bool]:
+    """
+    Render the template in a stream to the destination, the destination is replaced atomically.
+
+    When the hash of the unchanged output is given, the destination is replaced only if
+    the rendered content is different.
+
+    Returns
+    -------
+    The hash of the rendered content, and if the destination has been written.
+    """
+    atomic_file = _AtomicFile(destination)
+    try:
+        output = _FileOutput(atomic_file.file_open)
+        engine(template, used_vars, output)
+    except BaseException:
+        atomic_file.discard()
+        raise
+    output_hash = output.hash.hexdigest()
+    if output_hash == unchanged_output:
+        atomic_file.discard()
+        return output_hash, False
+    atomic_file.commit(template, fsync)
+    return output_hash, True
+
+
+# The state of the rendering worker processes, initialized once per process
+_RENDER_WORKER: dict[str, Any] = {}
+
+
+def _init_render_worker(
+    engine_name: str, cache_dir: str | None, fsync: bool, used_vars: Mapping[str, Any]
+) -> None:
+    _RENDER_WORKER["engine"] = _engine(engine_name, cache_dir)
+    _RENDER_WORKER["fsync"] = fsync
+    _RENDER_WORKER["vars"] = used_vars
+
+
+def _render_worker(
+    template: str, destination: str, item: Mapping[str, Any] | None, unchanged_output: str | None
+) -> tuple[str, bool]:
+    engine: Engine = _RENDER_WORKER["engine"]
+    file_vars: Mapping[str, Any] = _RENDER_WORKER["vars"]
+    if item is not None:
+        file_vars = _layered_vars(item, file_vars)
+    return save_stream(
+        template, destination, engine, file_vars, unchanged_output, fsync=_RENDER_WORKER["fsync"]
+    )
 
 
-def read_vars(vars_file: str) -> tuple[dict[str, Any], dict[str, Any]]:
-    include_tag = yaml_include.Constructor(base_dir=os.path.dirname(vars_file))
-    yaml.SafeLoader.add_constructor("!inc", include_tag)
-    yaml.SafeLoader.add_constructor("!include", include_tag)
-    with open(vars_file, encoding="utf-8") as file_open:
-        used = cast("dict[str, Any]", yaml.load(file_open.read(), yaml.SafeLoader))  # nosec
+def _proceed_parallel(
+    files: list[tuple[str, str, Mapping[str, Any] | None]],
+    used_vars: Mapping[str, Any],
+    options: Namespace,
+    manifest: "Manifest | None" = None,
+) -> None:
+    """
+    Render the files in a pool of processes.
+
+    The shared vars are sent once to each worker, then only the template, the destination and the
+    specific vars of the item are sent for each file.
+    The files are reported in the submission order, then the first error is raised as in a serial run.
+    """
+    from concurrent.futures import (  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+        ProcessPoolExecutor,
+    )
+
+    if _engine(options.engine) is None:
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=options.jobs,
+        initializer=_init_render_worker,
+        initargs=(
+            options.engine,
+            options.template_cache,
+            options.fsync == FSYNC_FILE,
+            dict(used_vars),
+        ),
+    ) as executor:
+        futures = []
+        for template, destination, item in files:
+            if manifest is not None:
+                file_vars = used_vars if item is None else _layered_vars(item, used_vars)
+                if manifest.is_up_to_date(template, destination, file_vars):
+                    continue
+            futures.append(
+                (
+                    destination,
+                    executor.submit(
+                        _render_worker,
+                        template,
+                        destination,
+                        item,
+                        None if manifest is None else manifest.unchanged_output(destination),
+                    ),
+                )
+            )
+        for destination, future in futures:
+            result = future.result()
+            if manifest is not None:
+                manifest.rendered(destination, *result)
+
+
+# The resolved extended vars files, by absolute path, with the files they depend on and their digest
+_EXTENDED_VARS: dict[str, tuple[list[str], str | None, dict[str, Any], dict[str, Any]]] = {}
+
+
+def _files_digest(files: list[str]) -> str | None:
+    import hashlib  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    digest = hashlib.sha256()
+    for file_name in files:
+        try:
+            with open(file_name, "rb") as file_open:
+                content = file_open.read()
+        except OSError:
+            return None
+        digest.update(file_name.encode("utf-8"))
+        digest.update(len(content).to_bytes(8, "big"))
+        digest.update(content)
+    return digest.hexdigest()
+
+
+def _read_extended_vars(
+    vars_file: str, jobs: int, cache: "InterpreterCache | None"
+) -> tuple[dict[str, Any], dict[str, Any], list[str]]:
+    """Read an extended vars file, memoized while the content of the files it depends on is unchanged."""
+    key = os.path.abspath(vars_file)
+    memoized = _EXTENDED_VARS.get(key)
+    if memoized is not None:
+        files, digest, current_vars, config = memoized
+        if digest is not None and _files_digest(files) == digest:
+            return copy.deepcopy(current_vars), copy.deepcopy(config), files
+
+    current_vars, config, files = _read_vars(vars_file, jobs, cache, memoize=True)
+    _EXTENDED_VARS[key] = (files, _files_digest(files), copy.deepcopy(current_vars), copy.deepcopy(config))
+    return current_vars, config, files
+
+
+def read_vars(
+    vars_file: str, jobs: int = 1, cache: "InterpreterCache | None" = None, memoize: bool = False
+) -> tuple[dict[str, Any], dict[str, Any]]:
+    """
+    Read the vars file, with the files it extends, and run the interpreters.
+
+    With `memoize`, the resolved extended files are kept for the process lifetime, and reused
+    (as isolated copies) while the content of the files they depend on (with the includes)
+    is unchanged.
+    """
+    current_vars, used, _ = _read_vars(vars_file, jobs, cache, memoize)
+    return current_vars, used
+
+
+def _read_vars(
+    vars_file: str, jobs: int, cache: "InterpreterCache | None", memoize: bool
+) -> tuple[dict[str, Any], dict[str, Any], list[str]]:
+    from c2c.template import yaml_loader  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    used, included_files = yaml_loader.load_vars_file(vars_file)
+    files = [os.path.abspath(vars_file), *included_files]
 
     used.setdefault("environment", [])
     used.setdefault("runtime_environment", [])
@@ -437,8 +1003,11 @@ def read_vars(vars_file: str) -> tuple[dict[str, Any], dict[str, Any]]:
 
     current_vars: dict[str, Any] = {}
     if "extends" in used:
-        current_vars, config = read_vars(used["extends"])
-        current_vars = copy.deepcopy(current_vars)
+        if memoize:
+            current_vars, config, extended_files = _read_extended_vars(used["extends"], jobs, cache)
+        else:
+            current_vars, config, extended_files = _read_vars(used["extends"], jobs, cache, memoize)
+        files += extended_files
 
         no_interpreted = set()
         no_interpreted.update(config.get("no_interpreted", []))
@@ -483,7 +1052,7 @@ def read_vars(vars_file: str) -> tuple[dict[str, Any], dict[str, Any]]:
         used["environment"] = environment
         used["runtime_environment"] = runtime_environment
 
-    new_vars = do_process(used, used.get("vars", {}))
+    new_vars = do_process(used, used.get("vars", {}), jobs, cache)
 
     update_paths = []
     for update_path in used.get("update_paths", []):
@@ -491,10 +1060,31 @@ def read_vars(vars_file: str) -> tuple[dict[str, Any], dict[str, Any]]:
         for i in range(len(split_path)):
             update_paths.append(".".join(split_path[: i + 1]))
     update_vars(current_vars, new_vars, set(update_paths))
-    return current_vars, used
+    return current_vars, used, files
+
+
+def do_process(
+    used: dict[str, Any],
+    new_vars: dict[str, Any],
+    jobs: int = 1,
+    cache: "InterpreterCache | None" = None,
+) -> dict[str, Any]:
+    """
+    Run the interpreters and the post processes on the vars.
+
+    With `jobs` greater than 1, the `bash` and `cmd` interpreters of the same priority run
+    concurrently on a pool of `jobs` threads.
+
+    The `bash` and `cmd` interpreters with `cache: true` or a `cache_ttl` get their results from
+    the `cache`, when it's provided.
+    """
+    import subprocess  # nosec # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+    from subprocess import (  # nosec # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+        CalledProcessError,
+    )
 
+    from c2c.template import yaml_loader  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
 
-def do_process(used: dict[str, Any], new_vars: dict[str, Any]) -> dict[str, Any]:
     globs = {
         "__builtins__": {},
         "__import__": __import__,
@@ -561,29 +1151,60 @@ def do_process(used: dict[str, Any], new_vars: dict[str, Any]) -> dict[str, Any]
 
         interpreters.sort(key=lambda v: -v["priority"])
 
-        class CmdAction:
+        class SubprocessAction:
+            """Base class of the interpreters that run a subprocess, with the optional results cache."""
+
+            error_format = "When running the expression '{expression}' in '{current_path}': {exception}"
+
             def __init__(self, interpreter: dict[str, Any]) -> None:
                 self.interpreter = interpreter
                 self.ignore_error = self.interpreter.get("ignore_error", False)
+                self.cache = (
+                    cache
+                    if cache is not None and interpreter.get("cache", "cache_ttl" in interpreter)
+                    else None
+                )
+
+            def command(self) -> Any:
+                raise NotImplementedError
+
+            def run(self, expression: str) -> str:
+                raise NotImplementedError
 
             def __call__(self, expression: str, current_path: str) -> Value:
-                cmd = interpreter["cmd"][:]  # [:] to clone
-                cmd.append(expression)
+                if self.cache is not None:
+                    cached = self.cache.get(self.command(), expression, self.interpreter.get("cache_ttl"))
+                    if cached is not None:
+                        return cached
                 try:
-                    with open(os.devnull, "w", encoding="utf-8") as dev_null:
-                        return subprocess.run(  # noqa: S603
-                            cmd,
-                            stderr=dev_null if self.ignore_error else None,
-                            check=True,
-                            stdout=subprocess.PIPE,
-                            encoding="utf-8",
-                        ).stdout.strip("\n")
+                    result = self.run(expression)
                 except (OSError, CalledProcessError) as exception:  # pragma: nocover
-                    error = f"When running the expression '{expression}' in '{current_path}': {exception}"
+                    error = self.error_format.format(
+                        expression=expression, current_path=current_path, exception=exception
+                    )
                     LOG.exception(error)
                     if self.ignore_error:
                         return "ERROR: " + error
                     sys.exit(1)
+                if self.cache is not None:
+                    self.cache.set(self.command(), expression, result)
+                return result
+
+        class CmdAction(SubprocessAction):
+            def command(self) -> Any:
+                return self.interpreter["cmd"]
+
+            def run(self, expression: str) -> str:
+                cmd = self.interpreter["cmd"][:]  # [:] to clone
+                cmd.append(expression)
+                with open(os.devnull, "w", encoding="utf-8") as dev_null:
+                    return subprocess.run(  # noqa: S603
+                        cmd,
+                        stderr=dev_null if self.ignore_error else None,
+                        check=True,
+                        stdout=subprocess.PIPE,
+                        encoding="utf-8",
+                    ).stdout.strip("\n")
 
         class PythonAction:
             def __init__(self, interpreter: dict[str, Any]) -> None:
@@ -591,7 +1212,7 @@ def do_process(used: dict[str, Any], new_vars: dict[str, Any]) -> dict[str, Any]
 
             def __call__(self, expression: str, current_path: str) -> Value:
                 try:
-                    return cast("Value", eval(expression, globs))  # nosec # noqa: S307
+                    return cast("Value", eval(compile_expression(expression), globs))  # nosec # noqa: S307
                 except Exception:  # pragma: nocover # pylint: disable=broad-except
                     error = f"When evaluating {var_name} expression '{expression}' in '{current_path}' as Python:\n{traceback.format_exc()}"
                     LOG.exception(error)
@@ -599,25 +1220,20 @@ def do_process(used: dict[str, Any], new_vars: dict[str, Any]) -> dict[str, Any]
                         return "ERROR: " + error
                     sys.exit(1)
 
-        class BashAction:
-            def __init__(self, interpreter: dict[str, Any]) -> None:
-                self.interpreter = interpreter
+        class BashAction(SubprocessAction):
+            error_format = "When running the expression '{expression}' in [{current_path}]: {exception}"
 
-            def __call__(self, expression: str, current_path: str) -> Value:
-                try:
-                    return subprocess.run(  # noqa: S602
-                        expression,
-                        shell=True,  # noqa: S602,RUF100
-                        check=True,
-                        stdout=subprocess.PIPE,
-                        encoding="utf-8",
-                    ).stdout.strip("\n")
-                except (OSError, CalledProcessError) as exception:
-                    error = f"When running the expression '{expression}' in [{current_path}]: {exception}"
-                    LOG.exception(error)
-                    if interpreter.get("ignore_error", False):
-                        return "ERROR: " + error
-                    sys.exit(1)
+            def command(self) -> Any:
+                return "bash"
+
+            def run(self, expression: str) -> str:
+                return subprocess.run(  # noqa: S602
+                    expression,
+                    shell=True,  # noqa: S602,RUF100
+                    check=True,
+                    stdout=subprocess.PIPE,
+                    encoding="utf-8",
+                ).stdout.strip("\n")
 
         class JsonAction:
             def __init__(self, interpreter: dict[str, Any]) -> None:
@@ -641,8 +1257,8 @@ def do_process(used: dict[str, Any], new_vars: dict[str, Any]) -> dict[str, Any]
 
             def __call__(self, value: str, current_path: str) -> Value:
                 try:
-                    return cast("dict[str, Any]", yaml.safe_load(value))
-                except ParserError as exception:  # pragma: nocover
+                    return cast("dict[str, Any]", yaml_loader.load(value))
+                except yaml_loader.YAMLError as exception:  # pragma: nocover
                     error = (
                         f"When evaluating {key} expression '{value}' in '{current_path}' as YAML: {exception}"
                     )
@@ -651,38 +1267,57 @@ def do_process(used: dict[str, Any], new_vars: dict[str, Any]) -> dict[str, Any]
                         return "ERROR: " + error
                     sys.exit(1)
 
-        for interpreter in interpreters:
-            for var_name in interpreter["vars"]:
-                if "cmd" in interpreter:
-                    action: Callable[[str, str], Value] = CmdAction(interpreter)
-                elif interpreter["name"] == "python":
-                    action = PythonAction(interpreter)
-                elif interpreter["name"] == "bash":
-                    action = BashAction(interpreter)
-                elif interpreter["name"] == "json":
-                    action = JsonAction(interpreter)
-                elif interpreter["name"] == "yaml":
-                    action = YamlAction(interpreter)
-                else:  # pragma: nocover
-                    LOG.error("Unknown interpreter name '%s'", interpreter["name"])
-                    sys.exit(1)
-
-                try:
-                    transform_path(new_vars, dot_split(var_name), action)
-                except KeyError:  # pragma: nocover
-                    LOG.exception("Expression for key not found: %s", var_name)
-                    sys.exit(1)
+        with ThreadPoolExecutor(max_workers=jobs) if jobs > 1 else nullcontext() as executor:
+            for _, priority_interpreters in itertools.groupby(interpreters, key=lambda v: v["priority"]):
+                pending: list[Future[Value]] = []
+                for interpreter in priority_interpreters:
+                    for var_name in interpreter["vars"]:
+                        if "cmd" in interpreter:
+                            action: Callable[[str, str], Value] = CmdAction(interpreter)
+                        elif interpreter["name"] == "python":
+                            action = PythonAction(interpreter)
+                        elif interpreter["name"] == "bash":
+                            action = BashAction(interpreter)
+                        elif interpreter["name"] == "json":
+                            action = JsonAction(interpreter)
+                        elif interpreter["name"] == "yaml":
+                            action = YamlAction(interpreter)
+                        else:  # pragma: nocover
+                            LOG.error("Unknown interpreter name '%s'", interpreter["name"])
+                            sys.exit(1)
+
+                        if executor is not None:
+                            action = _ConcurrentAction(
+                                action,
+                                executor if isinstance(action, SubprocessAction) else None,
+                                pending,
+                            )
+
+                        try:
+                            transform_path(new_vars, dot_split(var_name), action)
+                        except KeyError:  # pragma: nocover
+                            LOG.exception("Expression for key not found: %s", var_name)
+                            sys.exit(1)
+
+                if pending:
+                    # Get the results in the submission order to fail on the same error as a serial run
+                    for future in pending:
+                        future.result()
+                    _resolve_futures(new_vars)
 
     class PostprocessAction:
         def __init__(self, postprocess: dict[str, Any]) -> None:
             self.postprocess = postprocess
+            # The value is bound to a name instead of being formatted in the expression
+            self.expression = self.postprocess["expression"].format(POSTPROCESS_VALUE_NAME)
+            self.globals = dict(globs)
 
         def __call__(self, value: str, current_path: str) -> Value:
-            expression = self.postprocess["expression"]  # [:] to clone
-            expression = expression.format(repr(value))
+            self.globals[POSTPROCESS_VALUE_NAME] = value
             try:
-                return cast("Value", eval(expression, globs))  # nosec # noqa: S307
+                return cast("Value", eval(compile_expression(self.expression), self.globals))  # nosec # noqa: S307
             except ValueError as exception:  # pragma: nocover
+                expression = self.postprocess["expression"].format(repr(value))
                 error = f"When interpreting the expression '{expression}' in '{current_path}': {exception}"
                 LOG.exception(error)
                 if ignore_error:
@@ -700,12 +1335,57 @@ def do_process(used: dict[str, Any], new_vars: dict[str, Any]) -> dict[str, Any]
     return new_vars
 
 
+class _ConcurrentAction:
+    """Submit the action to the executor, after waiting for a value still computed by a previous one."""
+
+    def __init__(
+        self,
+        action: Callable[[str, str], Value],
+        executor: ThreadPoolExecutor | None,
+        pending: list[Future[Value]],
+    ) -> None:
+        self.action = action
+        self.executor = executor
+        self.pending = pending
+
+    def __call__(self, value: str, current_path: str) -> Value:
+        if isinstance(value, Future):
+            value = value.result()
+        if self.executor is None:
+            return self.action(value, current_path)
+        future = self.executor.submit(self.action, value, current_path)
+        self.pending.append(future)
+        # Replaced by its result at the end of the priority level
+        return cast("Value", future)
+
+
+def _resolve_futures(value: Any) -> None:
+    if isinstance(value, dict):
+        items: Iterable[tuple[Any, Any]] = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return
+    for key, item in items:
+        if isinstance(item, Future):
+            value[key] = item.result()
+        else:
+            _resolve_futures(item)
+
+
 def update_vars(
     current_vars: dict[str, Any],
     new_vars: dict[str, Any],
     update_paths: set[str],
     path: str | None = None,
 ) -> None:
+    """
+    Update the current vars with the new vars.
+
+    The paths in `update_paths` are merged (for the dicts) or appended (for the lists) instead of replaced.
+    Only the first level of `current_vars` is modified in place, the merged dicts and lists are
+    copied, so the other references to the current values are not modified.
+    """
     for key, value in new_vars.items():
         if "." in key:  # pragma: nocover
             LOG.warning("The key '%s' has a dot", key)
@@ -713,9 +1393,11 @@ def update_vars(
         if key_path in update_paths and key in current_vars:
             current_var = current_vars.get(key)
             if isinstance(value, dict) and isinstance(current_var, dict):
+                current_var = dict(current_var)
                 update_vars(current_var, value, update_paths, key_path)
+                current_vars[key] = current_var
             elif isinstance(value, list) and isinstance(current_var, list):
-                current_var.extend(value)
+                current_vars[key] = current_var + value
             elif value is None:
                 LOG.warning("Update the path '%s' with None", key_path)
             else:  # pragma: nocover
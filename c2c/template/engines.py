@@ -0,0 +1,176 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+"""The template engines, each template is compiled once per run and rendered in a stream."""
+
+import functools
+import os
+from collections import ChainMap
+from collections.abc import Callable, Mapping
+from typing import Any, Protocol, cast
+
+# The directories where the templates and the included templates are searched, as in bottle
+TEMPLATE_PATH = ["./", "./views/"]
+
+
+class Output(Protocol):
+    """The output where the rendered chunks are written."""
+
+    def write(self, chunk: str) -> Any: ...
+
+
+Render = Callable[[str, Mapping[str, Any], Output], None]
+
+
+def search_template(name: str) -> str | None:
+    """Get the file name of a template."""
+    for directory in TEMPLATE_PATH:
+        file_name = os.path.join(directory, name)
+        if os.path.isfile(file_name):
+            return file_name
+    return None
+
+
+def _stat(file_name: str) -> tuple[int, int] | None:
+    try:
+        stat = os.stat(file_name)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _jinja_load(name: str) -> tuple[str, str, Callable[[], bool]] | None:
+    file_name = search_template(name)
+    if file_name is None:
+        return None
+    stat = _stat(file_name)
+    with open(file_name, encoding="utf-8") as file_open:
+        return file_open.read(), file_name, lambda: _stat(file_name) == stat
+
+
+@functools.cache
+def _jinja_environment(cache_dir: str | None) -> Any:
+    import jinja2  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    return jinja2.Environment(  # nosec # noqa: S701
+        loader=jinja2.FunctionLoader(_jinja_load),
+        cache_size=-1,
+        bytecode_cache=None if cache_dir is None else jinja2.FileSystemBytecodeCache(cache_dir),
+    )
+
+
+def jinja_render(
+    template: str, used_vars: Mapping[str, Any], output: Output, cache_dir: str | None = None
+) -> None:
+    """Render a Jinja template, the vars are looked up in the mapping without being copied."""
+    tpl = _jinja_environment(cache_dir).get_template(template)
+    context = tpl.new_context(ChainMap(cast("dict[str, Any]", used_vars), tpl.globals), shared=True)
+    try:
+        for chunk in tpl.root_render_func(context):
+            output.write(chunk)
+    except Exception:  # pylint: disable=broad-exception-caught
+        tpl.environment.handle_exception()
+        raise  # pragma: nocover
+
+
+@functools.cache
+def _mako_lookup(cache_dir: str | None) -> Any:
+    from mako.lookup import TemplateLookup  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    return TemplateLookup(directories=TEMPLATE_PATH, input_encoding="utf-8", module_directory=cache_dir)
+
+
+# The compiled Mako templates, by cache directory and name, with the stat of the file
+_MAKO_TEMPLATES: dict[tuple[str | None, str], tuple[tuple[int, int] | None, Any]] = {}
+
+
+def _mako_template(template: str, cache_dir: str | None) -> Any:
+    from mako.exceptions import (  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+        TopLevelLookupException,
+    )
+    from mako.template import Template  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    file_name = search_template(template)
+    if file_name is None:
+        raise TopLevelLookupException(f"Can't locate template for uri {template!r}")  # noqa: TRY003
+    stat = _stat(file_name)
+    cached = _MAKO_TEMPLATES.get((cache_dir, template))
+    if cached is None or cached[0] != stat:
+        lookup = _mako_lookup(cache_dir)
+        cached = (
+            stat,
+            Template(  # nosec # noqa: S702
+                uri=template,
+                filename=file_name,
+                lookup=lookup,
+                input_encoding="utf-8",
+                module_directory=cache_dir,
+            ),
+        )
+        _MAKO_TEMPLATES[(cache_dir, template)] = cached
+    return cached[1]
+
+
+def mako_render(
+    template: str, used_vars: Mapping[str, Any], output: Output, cache_dir: str | None = None
+) -> None:
+    """
+    Render a Mako template, the vars are looked up in the mapping without being copied.
+
+    The vars are not given as the `pageargs` of the template.
+    """
+    from mako import runtime  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    tpl = _mako_template(template, cache_dir)
+    context = runtime.Context(output)
+    context._data = ChainMap(context._data, cast("dict[str, Any]", used_vars))  # noqa: SLF001 # pylint: disable=protected-access
+    context._outputting_as_unicode = True  # noqa: SLF001 # pylint: disable=protected-access
+    context._set_with_template(tpl)  # noqa: SLF001 # pylint: disable=protected-access
+    runtime._render_context(tpl, tpl.callable_, context)  # noqa: SLF001 # pylint: disable=protected-access
+
+
+_RENDERS = {
+    "jinja": jinja_render,
+    "mako": mako_render,
+}
+
+
+def get_render(engine_name: str, cache_dir: str | None = None) -> Render | None:
+    """
+    Get the render function of an engine.
+
+    Parameters
+    ----------
+    engine_name
+        The name of the engine, ``jinja`` or ``mako``.
+    cache_dir
+        The directory of the Jinja bytecode cache or of the Mako compiled modules.
+    """
+    render = _RENDERS.get(engine_name)
+    if render is None:
+        return None
+    return functools.partial(render, cache_dir=cache_dir)
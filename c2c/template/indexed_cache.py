@@ -0,0 +1,152 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+"""
+Indexed cache file format, with a lazy access to the top-level vars.
+
+The file starts with a header (magic, configuration offset and length, hash table offset and size),
+followed by a hash table of the top-level vars (key offset and length, value offset and length) using
+linear probing, then the keys (UTF-8) and the values (JSON) in the order of the vars.
+
+The file is memory-mapped, and only the requested vars are decoded.
+"""
+
+import json
+import mmap
+import struct
+import zlib
+from collections.abc import Iterator, Mapping
+from typing import Any
+
+MAGIC = b"C2CTIDX1"
+_HEADER = struct.Struct("<8sQQQQ")
+_BUCKET = struct.Struct("<QQQQ")
+
+
+def _json_key(key: Any) -> str:
+    """Get the key as it's converted by the JSON encoder."""
+    return next(iter(json.loads(json.dumps({key: None}))))
+
+
+def is_indexed(file_name: str) -> bool:
+    with open(file_name, "rb") as file_open:
+        return file_open.read(len(MAGIC)) == MAGIC
+
+
+def write(file_name: str, used_vars: Mapping[str, Any], config: dict[str, Any]) -> None:
+    """Write the cache file."""
+    entries = {_json_key(key): json.dumps(value).encode("utf-8") for key, value in used_vars.items()}
+    bucket_count = max(1, 2 * len(entries))
+    table_offset = _HEADER.size
+    offset = table_offset + bucket_count * _BUCKET.size
+
+    config_data = json.dumps(config).encode("utf-8")
+    config_offset = offset
+    offset += len(config_data)
+
+    table = bytearray(bucket_count * _BUCKET.size)
+    data = [config_data]
+    for key, value in entries.items():
+        key_data = key.encode("utf-8")
+        bucket = zlib.crc32(key_data) % bucket_count
+        while _BUCKET.unpack_from(table, bucket * _BUCKET.size)[0] != 0:
+            bucket = (bucket + 1) % bucket_count
+        _BUCKET.pack_into(
+            table, bucket * _BUCKET.size, offset, len(key_data), offset + len(key_data), len(value)
+        )
+        data += [key_data, value]
+        offset += len(key_data) + len(value)
+
+    with open(file_name, "wb") as file_open:
+        file_open.write(_HEADER.pack(MAGIC, config_offset, len(config_data), table_offset, bucket_count))
+        file_open.write(table)
+        file_open.writelines(data)
+
+
+class IndexedVars(Mapping[str, Any]):
+    """The top-level vars of an indexed cache file, decoded on access."""
+
+    def __init__(self, buffer: mmap.mmap, table_offset: int, bucket_count: int) -> None:
+        """Initialize the vars."""
+        self._buffer = buffer
+        self._table_offset = table_offset
+        self._bucket_count = bucket_count
+
+    def _bucket(self, index: int) -> tuple[int, int, int, int]:
+        return _BUCKET.unpack_from(self._buffer, self._table_offset + index * _BUCKET.size)
+
+    def _find(self, key: str) -> tuple[int, int] | None:
+        key_data = key.encode("utf-8")
+        index = zlib.crc32(key_data) % self._bucket_count
+        for _ in range(self._bucket_count):
+            key_offset, key_length, value_offset, value_length = self._bucket(index)
+            if key_offset == 0:
+                return None
+            if self._buffer[key_offset : key_offset + key_length] == key_data:
+                return value_offset, value_length
+            index = (index + 1) % self._bucket_count
+        return None
+
+    def __getitem__(self, key: str) -> Any:
+        found = self._find(key) if isinstance(key, str) else None
+        if found is None:
+            raise KeyError(key)
+        value_offset, value_length = found
+        return json.loads(self._buffer[value_offset : value_offset + value_length])
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self._find(key) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        buckets = [self._bucket(index) for index in range(self._bucket_count)]
+        for key_offset, key_length, _, _ in sorted(bucket for bucket in buckets if bucket[0] != 0):
+            yield self._buffer[key_offset : key_offset + key_length].decode("utf-8")
+
+    def __len__(self) -> int:
+        return sum(1 for index in range(self._bucket_count) if self._bucket(index)[0] != 0)
+
+
+class IndexedCache:
+    """A memory-mapped indexed cache file."""
+
+    def __init__(self, file_name: str) -> None:
+        """Open the cache file."""
+        with open(file_name, "rb") as file_open:
+            self._buffer = mmap.mmap(file_open.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._config_offset, self._config_length, table_offset, bucket_count = _HEADER.unpack_from(
+            self._buffer
+        )
+        if magic != MAGIC:
+            raise ValueError(f"The file '{file_name}' is not an indexed cache file")  # noqa: TRY003
+        self.used_vars = IndexedVars(self._buffer, table_offset, bucket_count)
+
+    @property
+    def config(self) -> dict[str, Any]:
+        return json.loads(self._buffer[self._config_offset : self._config_offset + self._config_length])  # type: ignore[no-any-return]
+
+    def close(self) -> None:
+        self._buffer.close()
@@ -0,0 +1,126 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+"""Persistent cache of the results of the subprocess-backed interpreters."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024
+
+
+def default_cache_path() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+    return os.path.join(cache_home, "c2c-template", "interpreters.sqlite")
+
+
+class InterpreterCache:
+    """
+    On-disk cache of the interpreters results, keyed by the interpreter command and the expression.
+
+    The results are stored in a SQLite database, opened on first use. When the total size of the
+    results exceeds `max_size` bytes, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str | None = None, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """Initialize the cache."""
+        self.path = path or default_cache_path()
+        self.max_size = max_size
+        self._connection: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS results "
+                "(key TEXT PRIMARY KEY, value TEXT, size INTEGER, created REAL, accessed REAL)"
+            )
+        return self._connection
+
+    @staticmethod
+    def _key(command: Any, expression: str) -> str:
+        return hashlib.sha256(json.dumps([command, expression]).encode("utf-8")).hexdigest()
+
+    def get(self, command: Any, expression: str, ttl: float | None = None) -> str | None:
+        """Get the cached result, `None` if it's missing or older than `ttl` seconds."""
+        key = self._key(command, expression)
+        now = time.time()
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT value, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created = row
+            if ttl is not None and now - created >= ttl:
+                self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+                return None
+            self.connection.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+            return str(value)
+
+    def set(self, command: Any, expression: str, value: str) -> None:
+        key = self._key(command, expression)
+        size = len(value.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)", (key, value, size, now, now)
+            )
+            self._evict()
+
+    def _evict(self) -> None:
+        total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+        for key, size in self.connection.execute(
+            "SELECT key, size FROM results ORDER BY accessed"
+        ).fetchall():
+            self.connection.execute("DELETE FROM results WHERE key = ?", (key,))
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+    def purge(self) -> None:
+        """Remove all the cached results."""
+        with self._lock:
+            if self._connection is None and not os.path.exists(self.path):
+                return
+            self.connection.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
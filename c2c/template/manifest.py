@@ -0,0 +1,178 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+"""Manifest of the rendered files, used to skip the templates whose inputs have not changed."""
+
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Mapping
+from typing import Any, cast
+
+# A name used by the template, that means we should consider all the vars
+ALL_VARS = "*"
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _jinja_used_names(source: str) -> set[str] | None:
+    """Get the names used by a Jinja template, `None` if it references other templates."""
+    import jinja2  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+    from jinja2 import meta  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    ast = jinja2.Environment(autoescape=False).parse(source)  # nosec # noqa: S701
+    if any(True for _ in meta.find_referenced_templates(ast)):
+        return None
+    return set(meta.find_undeclared_variables(ast))
+
+
+def _mako_used_names(source: str) -> set[str] | None:
+    """Get the names used by a Mako template, `None` if it references other templates."""
+    from mako import parsetree  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+    from mako.lexer import Lexer  # noqa: PLC0415 # pylint: disable=import-outside-toplevel
+
+    names: set[str] = set()
+    nodes = [Lexer(source).parse()]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, (parsetree.IncludeTag, parsetree.InheritTag, parsetree.NamespaceTag)):
+            return None
+        if hasattr(node, "undeclared_identifiers"):
+            names.update(node.undeclared_identifiers())
+        nodes += getattr(node, "nodes", [])
+    return names
+
+
+_USED_NAMES = {
+    "jinja": _jinja_used_names,
+    "mako": _mako_used_names,
+}
+
+
+class Manifest:
+    """
+    Manifest of the rendered files.
+
+    For each destination we store the hash of the template source, the engine, the hash of the vars
+    used by the template, the hash of the output and the size and modification time of the
+    destination file.
+
+    A template is not rendered when all of them are unchanged, and a rendered file is not written
+    when its content is unchanged.
+    The used vars are found by a static analysis of the template; the templates that include, extend
+    or import other templates are always rendered.
+    """
+
+    def __init__(self, file_name: str, engine: str) -> None:
+        """Load the manifest."""
+        self.file_name = file_name
+        self.engine = engine
+        self.entries: dict[str, dict[str, Any]] = {}
+        if os.path.exists(file_name):
+            with open(file_name, encoding="utf-8") as file_open:
+                self.entries = json.loads(file_open.read())
+        self.skipped = 0
+        self.regenerated = 0
+        self._templates: dict[str, tuple[str, list[str]]] = {}
+        self._pending: dict[str, dict[str, Any]] = {}
+
+    def _template(self, template: str) -> tuple[str, list[str]]:
+        """Get the hash and the used names of a template."""
+        if template not in self._templates:
+            with open(template, "rb") as file_open:
+                source = file_open.read()
+            names = _USED_NAMES[self.engine](source.decode("utf-8"))
+            self._templates[template] = (
+                _sha256(source),
+                [ALL_VARS] if names is None else sorted(names),
+            )
+        return self._templates[template]
+
+    def _vars_hash(self, names: list[str], used_vars: Mapping[str, Any]) -> str:
+        if names == [ALL_VARS]:
+            names = sorted(used_vars)
+        return _sha256(
+            json.dumps(
+                [[name, name in used_vars, used_vars.get(name)] for name in names],
+                sort_keys=True,
+                default=repr,
+            ).encode("utf-8")
+        )
+
+    @staticmethod
+    def _stat(destination: str) -> list[int] | None:
+        try:
+            stat = os.stat(destination)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_up_to_date(self, template: str, destination: str, used_vars: Mapping[str, Any]) -> bool:
+        """Check if the destination is up to date, otherwise prepare its new entry."""
+        template_hash, names = self._template(template)
+        entry = {
+            "template": template_hash,
+            "engine": self.engine,
+            "names": names,
+            "vars": self._vars_hash(names, used_vars),
+        }
+        current = self.entries.get(destination, {})
+        if (
+            names != [ALL_VARS]
+            and all(current.get(key) == value for key, value in entry.items())
+            and current.get("stat") == self._stat(destination)
+        ):
+            self.skipped += 1
+            return True
+        self._pending[destination] = entry
+        return False
+
+    def unchanged_output(self, destination: str) -> str | None:
+        """Get the hash of the recorded output, if the destination has not been modified since."""
+        current = self.entries.get(destination, {})
+        if current.get("stat") is not None and current.get("stat") == self._stat(destination):
+            return cast("str", current.get("output"))
+        return None
+
+    def rendered(self, destination: str, output_hash: str, written: bool) -> None:
+        """Record the rendered destination."""
+        entry = self._pending.pop(destination)
+        entry["output"] = output_hash
+        self.entries[destination] = entry | {"stat": self._stat(destination)}
+        if written:
+            self.regenerated += 1
+        else:
+            self.skipped += 1
+
+    def save(self) -> None:
+        """Save the manifest and report the skipped and regenerated files."""
+        with open(self.file_name, "w", encoding="utf-8") as file_open:
+            file_open.write(json.dumps(self.entries, indent=2, sort_keys=True))
+        print(f"{self.regenerated} files regenerated, {self.skipped} files skipped", file=sys.stderr)
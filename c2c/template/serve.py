@@ -0,0 +1,121 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+"""Serve the batch operations on a Unix socket, with the vars read once."""
+
+import json
+import logging
+import os
+import socketserver
+from argparse import Namespace
+from typing import Any
+
+from c2c.template import _read_options_vars, _run_operations
+
+LOG = logging.getLogger(__name__)
+
+
+def _stats(files: list[str]) -> list[tuple[int, int] | None]:
+    stats: list[tuple[int, int] | None] = []
+    for file_name in files:
+        try:
+            stat = os.stat(file_name)
+        except OSError:
+            stats.append(None)
+        else:
+            stats.append((stat.st_mtime_ns, stat.st_size))
+    return stats
+
+
+class VarsState:
+    """The vars read once, and read again when one of the files they come from changes."""
+
+    def __init__(self, options: Namespace) -> None:
+        """Read the vars."""
+        self.options = options
+        self.load()
+        # The interpreter cache is purged only on startup
+        self.options = Namespace(**{**vars(options), "purge_interpreter_cache": False})
+
+    def load(self) -> None:
+        """Read the vars, with the files they come from (the extended and the included files)."""
+        self.used_vars, self.config, self.files = _read_options_vars(self.options)
+        self.stats = _stats(self.files)
+        self.formatted: dict[tuple[bool, bool], Any] = {}
+
+    def run(self, job: Any) -> dict[str, Any]:
+        """Run a batch operation, after reading the vars again if a file has changed."""
+        if _stats(self.files) != self.stats:
+            LOG.info("The vars files have changed, read them again")
+            self.load()
+        return _run_operations(self.options, self.used_vars, self.config, [job], self.formatted)[0]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Get a batch operation by line, and write the result or the error as a JSON line."""
+
+    server: "Server"
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = self.server.state.run(json.loads(line))
+            except SystemExit:
+                response = {"error": "The operation failed, see the server logs"}
+            except Exception as exception:  # pylint: disable=broad-exception-caught
+                LOG.exception("The operation failed")
+                response = {"error": str(exception)}
+            self.wfile.write(json.dumps(response, default=repr).encode("utf-8") + b"\n")
+
+
+class Server(socketserver.UnixStreamServer):
+    """
+    The server of the batch operations.
+
+    The operations are run one at a time, in the order they are received.
+    """
+
+    def __init__(self, socket_path: str, options: Namespace) -> None:
+        """Read the vars and bind the socket, a remaining socket file is replaced."""
+        self.state = VarsState(options)
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _Handler)
+
+
+def serve(options: Namespace) -> None:
+    """Serve the batch operations on the `--serve` socket, until interrupted."""
+    server = Server(options.serve, options)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(options.serve)
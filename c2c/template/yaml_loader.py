@@ -0,0 +1,122 @@
+# Copyright (c) 2026, Camptocamp SA
+# All rights reserved.
+
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+
+# 1. Redistributions of source code must retain the above copyright notice, this
+#    list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright notice,
+#    this list of conditions and the following disclaimer in the documentation
+#    and/or other materials provided with the distribution.
+
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS" AND
+# ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT OWNER OR CONTRIBUTORS BE LIABLE FOR
+# ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+# The views and conclusions contained in the software and documentation are those
+# of the authors and should not be interpreted as representing official policies,
+# either expressed or implied, of the FreeBSD Project.
+
+"""The YAML loading, with the include tags, imported only by the modes that read YAML files."""
+
+import copy
+import functools
+import os
+import threading
+from typing import Any, cast
+
+import yaml
+import yaml_include
+from yaml import YAMLError
+
+try:
+    from yaml import CSafeDumper as YamlSafeDumper
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:  # pragma: nocover
+    from yaml import SafeDumper as YamlSafeDumper  # type: ignore[assignment]
+    from yaml import SafeLoader as YamlSafeLoader  # type: ignore[assignment]
+
+__all__ = ["YAMLError", "YamlSafeDumper", "YamlSafeLoader", "dump", "load", "load_vars_file"]
+
+# The parsed included files, by absolute path and loader, with the stats of the files they depend on
+_INCLUDED_FILES: dict[tuple[str, type[YamlSafeLoader]], tuple[list[tuple[str, int, int]], Any]] = {}
+_INCLUDE_DEPENDENCIES = threading.local()
+
+
+def load(data: str) -> Any:
+    """Load a YAML document, without the include tags."""
+    return yaml.load(data, YamlSafeLoader)  # nosec
+
+
+def dump(data: Any) -> str:
+    """Dump a YAML document."""
+    return cast("str", yaml.dump(data, Dumper=YamlSafeDumper))
+
+
+def _file_stat(path: str) -> tuple[str, int, int] | None:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return path, stat.st_mtime_ns, stat.st_size
+
+
+def _load_include(path: str, file: Any, loader_type: Any) -> Any:
+    """Load an included file, the parsed document is cached until the file or its includes changes."""
+    stat = _file_stat(os.path.abspath(path)) if "://" not in path else None
+    if stat is None:
+        return yaml.load(file, loader_type)  # nosec # noqa: S506
+
+    parent_dependencies: list[tuple[str, int, int]] | None = getattr(
+        _INCLUDE_DEPENDENCIES, "dependencies", None
+    )
+    key = (stat[0], loader_type)
+    cached = _INCLUDED_FILES.get(key)
+    if cached is not None and all(_file_stat(dependency[0]) == dependency for dependency in cached[0]):
+        dependencies, document = cached
+    else:
+        dependencies = [stat]
+        _INCLUDE_DEPENDENCIES.dependencies = dependencies
+        try:
+            document = yaml.load(file, loader_type)  # nosec # noqa: S506
+        finally:
+            _INCLUDE_DEPENDENCIES.dependencies = parent_dependencies
+        _INCLUDED_FILES[key] = (dependencies, document)
+    if parent_dependencies is not None:
+        parent_dependencies.extend(dependencies)
+    # The vars are modified in place, and the same file can be included several times
+    return copy.deepcopy(document)
+
+
+@functools.cache
+def _include_loader(base_dir: str) -> type[YamlSafeLoader]:
+    """Get a loader class that supports the include tags, relative to the base directory."""
+    include_tag = yaml_include.Constructor(base_dir=base_dir, custom_loader=_load_include)
+    loader = cast("type[YamlSafeLoader]", type("IncludeLoader", (YamlSafeLoader,), {}))
+    loader.add_constructor("!inc", include_tag)
+    loader.add_constructor("!include", include_tag)
+    return loader
+
+
+def load_vars_file(vars_file: str) -> tuple[dict[str, Any], list[str]]:
+    """Load a vars file with the include tags, return the document and the included files."""
+    parent_dependencies = getattr(_INCLUDE_DEPENDENCIES, "dependencies", None)
+    include_dependencies: list[tuple[str, int, int]] = []
+    _INCLUDE_DEPENDENCIES.dependencies = include_dependencies
+    try:
+        with open(vars_file, encoding="utf-8") as file_open:
+            document = cast(
+                "dict[str, Any]",
+                yaml.load(file_open.read(), _include_loader(os.path.dirname(vars_file))),  # nosec # noqa: S506
+            )
+    finally:
+        _INCLUDE_DEPENDENCIES.dependencies = parent_dependencies
+    return document, [dependency[0] for dependency in include_dependencies]
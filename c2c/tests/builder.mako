@@ -0,0 +1,2 @@
+var1: ${ var1 }
+var2: ${ var2 }
\ No newline at end of file
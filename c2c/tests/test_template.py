@@ -29,6 +29,7 @@
 import json
 import os
 import sys
+import tempfile
 from io import StringIO
 from unittest import TestCase
 
@@ -45,6 +46,15 @@ class Options:
     get_vars = []
     get_config = None
     files_builder = None
+    jobs = 1
+    cache_format = "json"
+    no_interpreter_cache = True
+    purge_interpreter_cache = False
+    manifest = None
+    template_cache = None
+    fsync = "none"
+    batch = None
+    serve = None
 
 
 class TestTemplate(TestCase):
@@ -211,6 +221,213 @@ class TestTemplate(TestCase):
         with open("bb.txt") as test:
             assert test.read() == "var1: first\nvar2: 2"
 
+    def test_builder_mako(self):
+        from c2c.template import main
+
+        sys.argv = [
+            "",
+            "--engine",
+            "mako",
+            "--vars",
+            "c2c/tests/builder_vars.yaml",
+            "--files-builder",
+            "c2c/tests/builder.mako",
+            "{name}.txt",
+            "iter",
+        ]
+        main()
+
+        with open("aa.txt") as test:
+            assert test.read() == "var1: first\nvar2: second"
+
+        with open("bb.txt") as test:
+            assert test.read() == "var1: first\nvar2: 2"
+
+    def test_template_cache(self):
+        from c2c.template import main
+
+        for engine in ("jinja", "mako"):
+            with tempfile.TemporaryDirectory() as directory:
+                sys.argv = [
+                    "",
+                    "--engine",
+                    engine,
+                    "--vars",
+                    "c2c/tests/builder_vars.yaml",
+                    "--template-cache",
+                    directory,
+                    "--files-builder",
+                    f"c2c/tests/builder.{engine}",
+                    "{name}.txt",
+                    "iter",
+                ]
+                main()
+                assert os.listdir(directory)
+
+                with open("aa.txt") as test:
+                    assert test.read() == "var1: first\nvar2: second"
+
+    def test_stream(self):
+        from c2c.template import engines
+
+        for engine in ("jinja", "mako"):
+            chunks = []
+
+            class Output:
+                def write(self, chunk):
+                    chunks.append(chunk)
+
+            engines.get_render(engine)(
+                f"c2c/tests/builder.{engine}", {"var1": "first", "var2": "second"}, Output()
+            )
+            assert len(chunks) > 1
+            assert "".join(chunks) == "var1: first\nvar2: second"
+
+    def test_atomic_save(self):
+        from c2c.template import main
+
+        with tempfile.TemporaryDirectory(dir="c2c/tests") as directory:
+            directory = os.path.relpath(directory)
+            template = os.path.join(directory, "file.txt.jinja")
+            destination = os.path.join(directory, "file.txt")
+            with open(template, "w") as f:
+                f.write("var1: {{ var1 }}")
+            os.chmod(template, 0o640)
+            with open(destination, "w") as f:
+                f.write("previous")
+
+            for fsync in ("none", "file", "batch"):
+                sys.argv = ["", "--vars", "c2c/tests/vars.yaml", "--files", template, "--fsync", fsync]
+                main()
+                with open(destination) as f:
+                    assert f.read() == "var1: first"
+                assert os.stat(destination).st_mode & 0o777 == 0o640
+                assert sorted(os.listdir(directory)) == ["file.txt", "file.txt.jinja"]
+
+            # On error, the destination is not modified and the temporary file is removed
+            with open(template, "w") as f:
+                f.write("var1: {{ var1 }}{{ unknown() }}")
+            sys.argv = ["", "--vars", "c2c/tests/vars.yaml", "--files", template]
+            self.assertRaises(Exception, main)
+            with open(destination) as f:
+                assert f.read() == "var1: first"
+            assert sorted(os.listdir(directory)) == ["file.txt", "file.txt.jinja"]
+
+    def test_batch(self):
+        from c2c.template import main
+
+        with tempfile.TemporaryDirectory() as directory:
+            batch = os.path.join(directory, "batch.yaml")
+            config = os.path.join(directory, "config.yaml")
+            with open(batch, "w") as f:
+                f.write(
+                    yaml.dump(
+                        [
+                            {"get-vars": ["VAR=var1", "iter"]},
+                            {"get-config": [config, "var1"]},
+                            {"files-builder": ["c2c/tests/builder.jinja", "{name}.txt", "iter"]},
+                        ]
+                    )
+                )
+            sys.argv = ["", "--vars", "c2c/tests/builder_vars.yaml", "--batch", batch]
+            sys.stdout = StringIO()
+            main()
+            result = json.loads(sys.stdout.getvalue())
+            sys.stdout = sys.__stdout__
+
+            assert result == [
+                {
+                    "get-vars": {
+                        "VAR": "first",
+                        "ITER": [{"name": "aa", "var2": "second"}, {"name": "bb", "var2": "2"}],
+                    }
+                },
+                {"get-config": config},
+                {"files-builder": ["aa.txt", "bb.txt"]},
+            ]
+            with open(config) as f:
+                assert yaml.safe_load(f.read())["vars"] == {"var1": "first"}
+            with open("bb.txt") as test:
+                assert test.read() == "var1: first\nvar2: 2"
+
+            with open(batch, "w") as f:
+                f.write(yaml.dump([{"unknown": []}]))
+            self.assertRaises(SystemExit, main)
+
+    def test_serve(self):
+        import socket
+        import threading
+
+        from c2c.template.serve import Server
+
+        with tempfile.TemporaryDirectory() as directory:
+            vars_file = os.path.join(directory, "vars.yaml")
+            with open(vars_file, "w") as f:
+                f.write("vars:\n  var1: first\n  var2: '{var1} second'\n")
+            options = Options()
+            options.vars = vars_file
+            options.runtime_environment_pattern = None
+            server = Server(os.path.join(directory, "socket"), options)
+            thread = threading.Thread(target=server.serve_forever)
+            thread.start()
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+                    client.connect(os.path.join(directory, "socket"))
+                    responses = client.makefile("r", encoding="utf-8")
+
+                    client.sendall(b'{"get-vars": ["var1", "VAR=var2"]}\n')
+                    assert json.loads(responses.readline()) == {
+                        "get-vars": {"VAR1": "first", "VAR": "first second"}
+                    }
+
+                    client.sendall(b'{"get-vars": ["unknown"]}\n')
+                    assert json.loads(responses.readline()) == {"error": "'unknown'"}
+
+                    # The vars are read again when the file changes
+                    with open(vars_file, "w") as f:
+                        f.write("vars:\n  var1: new\n  var2: '{var1} second'\n")
+                    client.sendall(b'{"get-vars": ["var2"]}\n')
+                    assert json.loads(responses.readline()) == {"get-vars": {"VAR2": "new second"}}
+            finally:
+                server.shutdown()
+                server.server_close()
+                thread.join()
+
+    def test_builder_parallel(self):
+        from c2c.template import main
+
+        for file_name in ("aa.txt", "bb.txt"):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        with tempfile.TemporaryDirectory() as directory:
+            sys.argv = [
+                "",
+                "--vars",
+                "c2c/tests/builder_vars.yaml",
+                "--jobs",
+                "2",
+                "--files-builder",
+                "c2c/tests/builder.jinja",
+                "{name}.txt",
+                "iter",
+                "--manifest",
+                os.path.join(directory, "manifest.json"),
+            ]
+            sys.stderr = StringIO()
+            main()
+            assert sys.stderr.getvalue() == "2 files regenerated, 0 files skipped\n"
+
+            with open("aa.txt") as test:
+                assert test.read() == "var1: first\nvar2: second"
+
+            with open("bb.txt") as test:
+                assert test.read() == "var1: first\nvar2: 2"
+
+            sys.stderr = StringIO()
+            main()
+            assert sys.stderr.getvalue() == "0 files regenerated, 2 files skipped\n"
+            sys.stderr = sys.__stderr__
+
     def test_update(self):
         from c2c.template import main
 
@@ -600,3 +817,272 @@ class TestTemplate(TestCase):
                 "used_vars": {"ggg": {"a": {"c": "g"}}, "hhh": [1, 2], "iii": [{"a": {"c": "g"}}]},
                 "config": {"runtime_environment": [], "runtime_interpreted": {}, "runtime_postprocess": []},
             }
+
+    def test_missing_dependency(self):
+        import c2c.template
+
+        sys.argv = ["", "--vars", "c2c/tests/missing_dependency.yaml", "--get-vars", "ff"]
+        with self.assertLogs("c2c.template", level="ERROR") as logs:
+            self.assertRaises(SystemExit, c2c.template.main)
+        assert logs.records[0].getMessage() == (
+            "The following variable isn't correctly interpreted due missing dependency:\n"
+            "'aa' depend on 'bb'\n"
+            "'bb' depend on 'cc'\n"
+            "'cc' depend on 'aa'\n"
+            "'dd' depend on 'unknown'\n"
+            "'ee' depend on 'dd'"
+        )
+
+    def test_format_chain(self):
+        from c2c.template import FormatWalker
+
+        used_vars = {f"var{index}": f"{{var{index + 1}}}" for index in range(1000)}
+        used_vars["var1000"] = "end"
+        used_vars["list"] = ["{var0}", {"key": "{list[0]}"}]
+        format_walker = FormatWalker(used_vars, [], [])
+        format_walker()
+
+        assert all(value == "end" for key, value in used_vars.items() if key != "list")
+        assert used_vars["list"] == ["end", {"key": "end"}]
+
+    def test_no_interpreted_wildcard(self):
+        from c2c.template import FormatWalker
+
+        used_vars = {
+            "aa": "a",
+            "bb": [{"cc": "{aa}", "dd": "{aa}"}, {"cc": "{aa}", "dd": ["{aa}", "{aa}"]}],
+        }
+        format_walker = FormatWalker(used_vars, ["bb[].cc", "bb[1].dd[]", "bb[].dd[0]"], [])
+        format_walker()
+
+        assert used_vars["bb"] == [{"cc": "{aa}", "dd": "a"}, {"cc": "{aa}", "dd": ["{aa}", "{aa}"]}]
+        assert "bb[0].cc" in format_walker.formatted
+
+    def test_parallel_interpreters(self):
+        from c2c.template import read_vars
+
+        serial_vars, _ = read_vars("c2c/tests/parallel.yaml")
+        parallel_vars, _ = read_vars("c2c/tests/parallel.yaml", jobs=4)
+
+        assert parallel_vars == serial_vars
+        assert parallel_vars["aa"] == "aa"
+        assert parallel_vars["bb"] == "bb"
+        assert parallel_vars["cc"] == "cc"
+        assert parallel_vars["dd"].startswith("ERROR: When running the expression 'exit 3' in '.dd'")
+        assert parallel_vars["ee"] == ["1", "2"]
+        assert parallel_vars["ff"] == [1, 2]
+
+    def test_interpreter_cache(self):
+        from c2c.template import read_vars
+        from c2c.template.interpreter_cache import InterpreterCache
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = InterpreterCache(os.path.join(directory, "cache.sqlite"))
+            first_vars, _ = read_vars("c2c/tests/interpreter_cache.yaml", cache=cache)
+            second_vars, _ = read_vars("c2c/tests/interpreter_cache.yaml", cache=cache)
+
+            # Cached without expiry
+            assert second_vars["aa"] == first_vars["aa"]
+            # Expired
+            assert second_vars["bb"] != first_vars["bb"]
+            # Not cached
+            assert second_vars["cc"] != first_vars["cc"]
+
+            cache.purge()
+            third_vars, _ = read_vars("c2c/tests/interpreter_cache.yaml", cache=cache)
+            assert third_vars["aa"] != first_vars["aa"]
+            cache.close()
+
+    def test_interpreter_cache_eviction(self):
+        from c2c.template.interpreter_cache import InterpreterCache
+
+        with tempfile.TemporaryDirectory() as directory:
+            cache = InterpreterCache(os.path.join(directory, "cache.sqlite"), max_size=10)
+            cache.set("bash", "first", "12345")
+            cache.set("bash", "second", "12345")
+            assert cache.get("bash", "first") == "12345"
+            cache.set("bash", "third", "12345")
+
+            assert cache.get("bash", "first") == "12345"
+            assert cache.get("bash", "second") is None
+            assert cache.get("bash", "third") == "12345"
+            assert cache.get(["sh", "-c"], "first") is None
+            cache.close()
+
+    def test_postprocess_compiled(self):
+        from c2c.template import compile_expression, do_process
+
+        compile_expression.cache_clear()
+        used = {"postprocess": [{"expression": "[{} for _ in range(2)]", "vars": ["aa.[]"]}]}
+        new_vars = do_process(used, {"aa": ["a'b", {"c": "d"}, 3]})
+
+        assert new_vars == {"aa": [["a'b", "a'b"], [{"c": "d"}, {"c": "d"}], [3, 3]]}
+        assert compile_expression.cache_info().misses == 1
+        assert compile_expression.cache_info().hits == 2
+
+    def test_include_loader(self):
+        from c2c.template import read_vars
+        from c2c.template.yaml_loader import YamlSafeLoader
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "vars.yaml"), "w") as vars_file:
+                vars_file.write("vars:\n  aa: !include fragment.yaml\n  bb: !include fragment.yaml\n")
+            with open(os.path.join(directory, "fragment.yaml"), "w") as fragment_file:
+                fragment_file.write("key: value\n")
+
+            used_vars, _ = read_vars(os.path.join(directory, "vars.yaml"))
+            assert used_vars == {"aa": {"key": "value"}, "bb": {"key": "value"}}
+            assert used_vars["aa"] is not used_vars["bb"]
+
+            with open(os.path.join(directory, "fragment.yaml"), "w") as fragment_file:
+                fragment_file.write("key: new value\n")
+            used_vars, _ = read_vars(os.path.join(directory, "vars.yaml"))
+            assert used_vars == {"aa": {"key": "new value"}, "bb": {"key": "new value"}}
+
+        assert "!include" not in YamlSafeLoader.yaml_constructors
+
+    def test_update_alias(self):
+        from c2c.template import read_vars
+
+        used_vars, _ = read_vars("c2c/tests/update_alias.yaml")
+
+        assert used_vars == {
+            "aa": [1, 2, 3],
+            "bb": [1, 2],
+            "cc": {"x": {"y": 1, "z": 2}},
+            "dd": {"x": {"y": 1}},
+        }
+
+    def test_memoized_extends(self):
+        from c2c.template import read_vars
+
+        with tempfile.TemporaryDirectory() as directory:
+            base = os.path.join(directory, "base.yaml")
+            with open(base, "w") as base_file:
+                base_file.write(
+                    "vars:\n  date: date +%s%N\n  obj: !include fragment.yaml\n"
+                    "interpreted:\n  bash: [date]\n"
+                )
+            with open(os.path.join(directory, "fragment.yaml"), "w") as fragment_file:
+                fragment_file.write("key: value\n")
+            for name in ("dev", "prod"):
+                with open(os.path.join(directory, f"{name}.yaml"), "w") as vars_file:
+                    vars_file.write(f"extends: {base}\nvars:\n  env: {name}\n")
+
+            dev_vars, _ = read_vars(os.path.join(directory, "dev.yaml"), memoize=True)
+            prod_vars, _ = read_vars(os.path.join(directory, "prod.yaml"), memoize=True)
+            assert dev_vars["env"] == "dev"
+            assert prod_vars["env"] == "prod"
+            assert dev_vars["date"] == prod_vars["date"]
+            assert dev_vars["obj"] is not prod_vars["obj"]
+
+            with open(os.path.join(directory, "fragment.yaml"), "w") as fragment_file:
+                fragment_file.write("key: other value\n")
+            dev_vars_changed, _ = read_vars(os.path.join(directory, "dev.yaml"), memoize=True)
+            assert dev_vars_changed["obj"] == {"key": "other value"}
+            assert dev_vars_changed["date"] != dev_vars["date"]
+
+    def test_indexed_cache(self):
+        import c2c.template
+        from c2c.template.indexed_cache import IndexedCache
+
+        sys.argv = ["", "--vars", "c2c/tests/vars.yaml", "--get-cache", "cache.json"]
+        c2c.template.main()
+        sys.argv = ["", "--vars", "c2c/tests/vars.yaml", "--get-cache", "cache.idx", "--cache-format=indexed"]
+        c2c.template.main()
+
+        with open("cache.json") as f:
+            json_cache = json.loads(f.read())
+        indexed_cache = IndexedCache("cache.idx")
+        assert list(indexed_cache.used_vars) == list(json_cache["used_vars"])
+        assert dict(indexed_cache.used_vars) == json_cache["used_vars"]
+        assert indexed_cache.config == json_cache["config"]
+        assert "unknown" not in indexed_cache.used_vars
+        indexed_cache.close()
+
+        sys.argv = ["", "--cache", "cache.idx", "--get-var", "var_interpreted", "VAR_1=var1"]
+        sys.stdout = StringIO()
+        c2c.template.main()
+        assert sys.stdout.getvalue() == "VAR_INTERPRETED=4\nVAR_1='first'\n"
+        sys.stdout = sys.__stdout__
+
+        sys.argv = ["", "--cache", "cache.idx", "--files", "c2c/tests/jinja.jinja"]
+        c2c.template.main()
+        with open("c2c/tests/jinja") as f:
+            assert f.read().startswith("var1: first, var2: second\n")
+
+    def test_manifest(self):
+        import c2c.template
+
+        with tempfile.TemporaryDirectory(dir="c2c/tests") as directory:
+            directory = os.path.relpath(directory)
+            template = os.path.join(directory, "file.txt.jinja")
+            with open(template, "w") as f:
+                f.write("var1: {{ var1 }}\n")
+            manifest = os.path.join(directory, "manifest.json")
+            destination = os.path.join(directory, "file.txt")
+            sys.argv = ["", "--vars", "c2c/tests/vars.yaml", "--files", template, "--manifest", manifest]
+
+            sys.stderr = StringIO()
+            c2c.template.main()
+            assert sys.stderr.getvalue() == "1 files regenerated, 0 files skipped\n"
+            with open(destination) as f:
+                assert f.read() == "var1: first"
+            mtime = os.stat(destination).st_mtime_ns
+
+            sys.stderr = StringIO()
+            c2c.template.main()
+            assert sys.stderr.getvalue() == "0 files regenerated, 1 files skipped\n"
+            assert os.stat(destination).st_mtime_ns == mtime
+
+            with open(manifest) as f:
+                assert json.loads(f.read())[destination]["names"] == ["var1"]
+
+            # The destination is regenerated when it's modified
+            with open(destination, "w") as f:
+                f.write("modified")
+            sys.stderr = StringIO()
+            c2c.template.main()
+            assert sys.stderr.getvalue() == "1 files regenerated, 0 files skipped\n"
+            with open(destination) as f:
+                assert f.read() == "var1: first"
+
+            with open(template, "w") as f:
+                f.write("var1: {{ var1 }}, var2: {{ var2 }}\n")
+            sys.stderr = StringIO()
+            c2c.template.main()
+            assert sys.stderr.getvalue() == "1 files regenerated, 0 files skipped\n"
+            with open(destination) as f:
+                assert f.read() == "var1: first, var2: second"
+            sys.stderr = sys.__stderr__
+
+    def test_get_vars_imports(self):
+        import subprocess
+
+        from c2c.template import main
+
+        sys.argv = ["", "--vars", "c2c/tests/vars.yaml", "--get-cache", "cache.json"]
+        main()
+
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                "import sys; sys.argv = sys.argv[1:]; import c2c.template; c2c.template.main()",
+                "",
+                "--cache",
+                "cache.json",
+                "--get-vars",
+                "var1",
+            ],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            encoding="utf-8",
+        )
+        assert result.stdout == "VAR1='first'\n"
+        modules = {line.split("|")[-1].strip() for line in result.stderr.splitlines()}
+        for module in ("yaml", "yaml_include", "bottle", "jinja2", "mako", "sqlite3", "subprocess"):
+            assert module not in modules